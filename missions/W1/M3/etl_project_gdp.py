@@ -5,7 +5,7 @@ Wikipedia에서 국가별 GDP 데이터를 추출, 변환, 적재하는 ETL 스
     1. Extract: Wikipedia의 'List of countries by GDP (nominal)' 페이지에서 국가별 GDP 데이터를 추출합니다.
     2. Transform: 추출된 데이터를 정제하고, GDP 단위를 백만 달러에서 십억 달러로 변환하며, 각 국가에 대해 Region 정보를 매핑합니다.
        또한 'Processed_Time' 컬럼을 추가하여 데이터의 생성 시점을 기록합니다.
-    3. Load: 변환된 데이터를 JSON 파일로 저장합니다. 기존 데이터가 존재할 경우 이력을 누적(Append)합니다.
+    3. Load: 변환된 데이터를 실행 회차별 Parquet 파일로 저장합니다. 기존 이력은 다시 쓰지 않고 새 파일만 추가(Append)합니다.
     4. Analysis: 가장 최근에 처리된 데이터를 기준으로 100B USD 이상 국가 목록과 Region별 Top 5 평균 GDP를 출력합니다.
 
 추출된 GDP 데이터 개수, Region 매핑 상태, 필터링된 데이터 개수 등 각 단계의 진행 상황을 로그 파일에 기록합니다.
@@ -22,25 +22,50 @@ NOTE:
     JSON 파일을 수동으로 유지하는 것이 더 안정적이고 투명한 방법이라고 판단했습니다.
 """
 import datetime
+import io
 import json
+import logging
 import os
+import re
+import uuid
 
-import bs4
 import pandas as pd
 import requests
 
 # 설정값
 WIKIPEDIA_URL = 'https://en.wikipedia.org/wiki/List_of_countries_by_GDP_%28nominal%29'
-JSON_PATH = 'data/Countries_by_GDP.json'
+PARQUET_DIR = 'data/Countries_by_GDP'
 COUNTRY_REGION_JSON = 'Countries_Regions.json'
 LOG_FILE = 'data/etl_project_log.txt'
 
+# Country-Region 매핑 캐시 (_get_region_map 최초 호출 시 로드)
+_REGION_MAP = None
+
+# 정제용 정규 표현식 (호출마다 패턴을 다시 넘기지 않도록 모듈 로드 시 한 번만 컴파일)
+# GDP 값: '('/'['로 감싼 주석, 쉼표, 공백 / 국가명: [n 1] 등 각주 표기
+_GDP_CLEAN_RE = re.compile(r'[\(\[].*?[\)\]]|,|\s')
+_FOOTNOTE_RE = re.compile(r'\[.*?\]')
+
+# ETL 진행 로그 (data 디렉토리가 생성된 뒤 첫 기록 시점에 파일을 열도록 delay=True)
+_LOG_HANDLER = logging.FileHandler(LOG_FILE, encoding='utf-8', delay=True)
+_LOG_HANDLER.setFormatter(
+    logging.Formatter('%(asctime)s, %(message)s', datefmt='%Y-%B-%d-%H-%M-%S'))
+_LOGGER = logging.getLogger(__name__)
+_LOGGER.setLevel(logging.INFO)
+_LOGGER.addHandler(_LOG_HANDLER)
+
+# Wikipedia 요청용 HTTP 세션 (연결 재사용, gzip/deflate 압축 응답은 requests가 자동 협상)
+_SESSION = requests.Session()
+_SESSION.headers.update({
+    'User-Agent':
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
+})
+
 
 def init_data_dir():
     """데이터 디렉토리가 존재하지 않으면 생성합니다."""
-    data_dirs = [JSON_PATH, LOG_FILE]
-    for path in data_dirs:
-        dir_name = os.path.dirname(path)
+    data_dirs = [PARQUET_DIR, os.path.dirname(LOG_FILE)]
+    for dir_name in data_dirs:
         if not os.path.exists(dir_name):
             os.makedirs(dir_name)
 
@@ -48,22 +73,35 @@ def init_data_dir():
 def log_progress(message: str) -> None:
     """ETL 프로세스의 각 단계와 시간을 로그 파일에 기록합니다.
 
+    매 호출마다 파일을 열고 닫지 않고, 한 번 열린 logging 핸들러를 재사용합니다.
+
     Args:
         message: 기록할 로그 메시지.
     """
-    timestamp_format = '%Y-%B-%d-%H-%M-%S'
-    now = datetime.datetime.now()
-    timestamp = now.strftime(timestamp_format)
+    _LOGGER.info(message)
+
 
-    with open(LOG_FILE, 'a+', encoding='utf-8') as f:
-        f.write(f"{timestamp}, {message}\n")
+def _get_region_map() -> dict:
+    """Country-Region 매핑 JSON을 최초 호출 시 한 번만 읽고 이후에는 캐시를 반환합니다.
+
+    Returns:
+        국가명을 키로, Region을 값으로 하는 딕셔너리. 파일이 없으면 빈 딕셔너리.
+    """
+    global _REGION_MAP
+    if _REGION_MAP is None:
+        if os.path.exists(COUNTRY_REGION_JSON):
+            with open(COUNTRY_REGION_JSON, 'r', encoding='utf-8') as f:
+                _REGION_MAP = json.load(f)
+        else:
+            _REGION_MAP = {}
+    return _REGION_MAP
 
 
 def extract(url: str) -> pd.DataFrame:
     """웹 페이지에서 모든 국가의 GDP 원시 데이터를 추출합니다.
 
     이 단계에서는 필터링을 수행하지 않고 소스 테이블의 데이터를 최대한 보존합니다.
-    구조적 헤더(th) 및 static-row-header는 추출 대상에서 제외합니다.
+    구조적 헤더(th)는 컬럼명으로 처리되며, static-row-header(World) 행은 추출 대상에서 제외합니다.
 
     Args:
         url: 데이터를 추출할 위키피디아 페이지 URL.
@@ -73,48 +111,33 @@ def extract(url: str) -> pd.DataFrame:
     """
     log_progress("Extract phase Started")
 
-    headers = {
-        'User-Agent':
-        'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
-    }
-    response = requests.get(url, headers=headers)
+    response = _SESSION.get(url)
     response.raise_for_status()
-    soup = bs4.BeautifulSoup(response.text, 'html.parser')
 
-    df = pd.DataFrame(columns=["Country", "GDP_USD_million"])
+    # lxml 기반 pd.read_html로 대상 테이블을 행 단위 순회 없이 바로 데이터프레임으로 읽습니다.
+    # 원본 GDP 텍스트를 보존하기 위해 천 단위 구분자 변환(thousands)은 적용하지 않습니다.
+    # 캡션 전체로 대상 테이블을 한정하며, lxml(EXSLT) 정규식은 백슬래시 이스케이프를
+    # 처리하지 못하므로 '(', '$', ')'는 문자 클래스로 표기합니다.
+    try:
+        tables = pd.read_html(
+            io.BytesIO(response.content),
+            match=r'GDP forecast or estimate [(]million US[$][)] by country',
+            flavor='lxml',
+            thousands=None)
+    except ValueError as e:
+        log_progress("Extract phase Failed: Target table not found")
+        raise ValueError("Target table not found") from e
 
-    tables = soup.find_all('table', {'class': 'wikitable'})
-    target_table = None
-    for table in tables:
-        if 'GDP forecast or estimate (million US$) by country' in table.text:
-            target_table = table
-            break
+    # 구조적 헤더(th) 행은 컬럼으로 흡수되므로 앞의 두 컬럼(국가, GDP)만 사용합니다.
+    df = tables[0].iloc[:, [0, 1]].copy()
+    df.columns = ["Country", "GDP_USD_million"]
+    df = df.dropna()
 
-    if not target_table:
-        log_progress("Extract phase Failed: Target table not found")
-        raise ValueError("Target table not found")
-
-    rows = target_table.find_all('tr')
-    for row in rows:
-        row_classes = row.get('class')
-        is_static_header = isinstance(
-            row_classes, list) and 'static-row-header' in row_classes
-        if row.find('th') or is_static_header:
-            continue
-
-        cols = row.find_all('td')
-        if len(cols) >= 3:
-            country_element = cols[0].find('a')
-            country = country_element.get_text(
-                strip=True) if country_element else cols[0].get_text(
-                    strip=True)
-            gdp_raw = cols[1].get_text(strip=True)
-
-            new_row = pd.DataFrame([{
-                "Country": country,
-                "GDP_USD_million": gdp_raw
-            }])
-            df = pd.concat([df, new_row], ignore_index=True)
+    # 국가명의 각주 표기([n 1] 등)를 제거하고 static-row-header(World) 행을 제외합니다.
+    df['Country'] = df['Country'].str.replace(_FOOTNOTE_RE, '',
+                                              regex=True).str.strip()
+    df['GDP_USD_million'] = df['GDP_USD_million'].astype(str)
+    df = df[df['Country'] != 'World'].copy()
 
     log_progress(f"Extract phase Ended: {len(df)} rows fetched")
     return df
@@ -135,11 +158,11 @@ def transform(df: pd.DataFrame) -> pd.DataFrame:
     now = datetime.datetime.now()
     df['Processed_Time'] = now.strftime('%Y-%m-%d %H:%M:%S')
 
-    # 2. GDP 값 정제: '18,080 (2024)' 등 괄호 주석 제거 및 쉼표 제거
-    # 정규 표현식을 사용하여 '(' 또는 '['로 시작하는 모든 뒤쪽 텍스트를 제거합니다.
-    df['GDP_USD_million'] = df['GDP_USD_million'].str.replace(
-        r'[\(\[].*?[\)\]]', '', regex=True).str.strip()
-    df['GDP_USD_million'] = df['GDP_USD_million'].str.replace(',', '')
+    # 2. GDP 값 정제: '18,080 (2024)' 등 괄호 주석, 쉼표, 공백 제거
+    # 정규 표현식 한 번으로 '('/'['로 감싼 주석, 쉼표, 공백을 모두 제거합니다.
+    df['GDP_USD_million'] = df['GDP_USD_million'].str.replace(_GDP_CLEAN_RE,
+                                                              '',
+                                                              regex=True)
 
     # 숫자형 변환 (숫자가 아닌 값은 NaN 처리)
     df['GDP_USD_million'] = pd.to_numeric(df['GDP_USD_million'],
@@ -147,7 +170,8 @@ def transform(df: pd.DataFrame) -> pd.DataFrame:
 
     # 유효하지 않은 데이터 필터링
     initial_count = len(df)
-    df = df.dropna(subset=['GDP_USD_million']).reset_index(drop=True)
+    # 인덱스는 마지막 정렬에서 재설정하므로 여기서는 제자리(inplace) 필터링만 수행
+    df.dropna(subset=['GDP_USD_million'], inplace=True)
     filtered_count = initial_count - len(df)
 
     if filtered_count > 0:
@@ -156,45 +180,49 @@ def transform(df: pd.DataFrame) -> pd.DataFrame:
         )
 
     # 3. 단위 변환 및 Region 매핑
-    df['GDP_USD_billion'] = (df['GDP_USD_million'] / 1000).round(2)
+    # 소수점 2자리 값이므로 float32로 충분하며, 원본 million 컬럼은 정렬 전에 제거합니다.
+    df['GDP_USD_billion'] = (df['GDP_USD_million'] /
+                             1000).round(2).astype('float32')
+    df = df.drop(columns=['GDP_USD_million'])
 
-    if os.path.exists(COUNTRY_REGION_JSON):
-        with open(COUNTRY_REGION_JSON, 'r', encoding='utf-8') as f:
-            region_map = json.load(f)
-        df['Region'] = df['Country'].map(region_map).fillna('Unknown')
-    else:
-        df['Region'] = 'Unknown'
+    df['Region'] = df['Country'].map(_get_region_map()).fillna('Unknown')
+    # Region은 소수의 값만 가지므로 category로 저장하여 메모리와 groupby 비용을 줄입니다.
+    df['Region'] = df['Region'].astype('category')
 
     # 분석을 위한 정렬
     df = df.sort_values(by='GDP_USD_billion',
-                        ascending=False).reset_index(drop=True)
+                        ascending=False,
+                        ignore_index=True)
 
     log_progress("Transform phase Ended")
     return df
 
 
 def load(df: pd.DataFrame, path: str):
-    """변환된 데이터를 JSON 파일로 저장합니다.
+    """변환된 데이터를 Parquet 파일로 저장합니다.
+
+    실행 회차마다 새 파티션 파일을 추가하므로 기존 이력을 읽거나 다시 쓰지 않습니다.
+    전체 이력은 `pd.read_parquet(path)`로 디렉토리 전체를 읽어 확인합니다.
 
     Args:
         df: 이번 회차에 변환된 데이터프레임.
-        path: 저장할 JSON 파일 경로.
+        path: 파티션 파일을 저장할 디렉토리 경로.
     """
     log_progress("Load phase Started")
 
-    if os.path.exists(path):
-        try:
-            existing_df = pd.read_json(path)
-            df = pd.concat([existing_df, df], ignore_index=True)
-            log_progress(
-                f"Load: New records appended to existing data in {path}")
-        except Exception as e:
-            log_progress(
-                f"Load Warning: Failed to load history, starting new file. {e}"
-            )
+    if df.empty:
+        log_progress("Load phase Ended: No records to store")
+        return
 
-    df.to_json(path, orient='records', indent=4, force_ascii=False)
-    log_progress(f"Load phase Ended: Total {len(df)} records stored")
+    # 파일명은 행의 Processed_Time과 고유 ID로 구성하여 같은 초에 실행되어도 겹치지 않게 하고,
+    # 'xb' 모드로 열어 이미 존재하는 파일은 덮어쓰지 않고 FileExistsError로 실패합니다.
+    processed_time = datetime.datetime.strptime(df['Processed_Time'].iloc[0],
+                                                '%Y-%m-%d %H:%M:%S')
+    partition = f"{processed_time:%Y%m%d_%H%M%S}_{uuid.uuid4().hex}"
+    file_path = os.path.join(path, f"{partition}.parquet")
+    with open(file_path, 'xb') as f:
+        df.to_parquet(f, engine='pyarrow', compression='snappy', index=False)
+    log_progress(f"Load phase Ended: {len(df)} records stored in {file_path}")
 
 
 def run_analysis(df: pd.DataFrame):
@@ -206,8 +234,14 @@ def run_analysis(df: pd.DataFrame):
     log_progress("Analysis phase Started")
 
     # 최신 데이터만 추출하여 분석 수행
-    latest_time = df['Processed_Time'].max()
-    latest_df = df[df['Processed_Time'] == latest_time].copy()
+    # 파티션 파일은 실행 시각 순으로 읽히므로 대부분 이미 정렬되어 있고, 아닐 때만 정렬합니다.
+    if not df['Processed_Time'].is_monotonic_increasing:
+        df = df.sort_values(by='Processed_Time',
+                            kind='stable',
+                            ignore_index=True)
+    latest_time = df['Processed_Time'].iloc[-1]
+    latest_start = df['Processed_Time'].searchsorted(latest_time)
+    latest_df = df.iloc[latest_start:].copy()
 
     # 1. 100B USD 이상 국가 필터링
     high_gdp_df = latest_df[latest_df['GDP_USD_billion'] >= 100][[
@@ -232,8 +266,11 @@ def run_analysis(df: pd.DataFrame):
     print("\n" + "=" * 75)
     print("2. 각 Region별 Top 5 국가의 GDP 평균 (Billion USD)")
     print("-" * 75)
-    region_avg_series = latest_df.groupby('Region')['GDP_USD_billion'].apply(
-        lambda x: x.nlargest(5).mean())
+    # groupby-apply(lambda) 대신 정렬 후 head(5)/mean()으로 그룹별 콜백 없이 계산합니다.
+    sorted_df = latest_df.sort_values(by='GDP_USD_billion', ascending=False)
+    top5_df = sorted_df.groupby('Region', observed=True).head(5)
+    region_avg_series = top5_df.groupby(
+        'Region', observed=True)['GDP_USD_billion'].mean()
     region_avg = region_avg_series.reset_index(
         name='Top5_Average_GDP').sort_values(by='Top5_Average_GDP',
                                              ascending=False)
@@ -262,13 +299,12 @@ if __name__ == '__main__':
             # 2. Transform
             transformed_data = transform(raw_data)
 
-            # 3. Load (JSON)
-            load(transformed_data, JSON_PATH)
+            # 3. Load (Parquet)
+            load(transformed_data, PARQUET_DIR)
 
             # 4. Analysis
-            if os.path.exists(JSON_PATH):
-                history_df = pd.read_json(JSON_PATH)
-                run_analysis(history_df)
+            history_df = pd.read_parquet(PARQUET_DIR, engine='pyarrow')
+            run_analysis(history_df)
 
             log_progress("ETL Process Completed Successfully")
     except Exception as e:
@@ -7,16 +7,21 @@ Wikipedia에서 국가별 GDP 데이터를 추출, 변환, 적재(Database)하
        또한 SQLite의 TIMESTAMP 타입과 호환되는 처리 시점을 기록합니다.
     3. Load: SQLiteHandler 클래스를 사용하여 'World_Economies.db'의 'Countries_by_GDP' 테이블에 적재합니다.
        이때 id(PK), Country, Region, GDP_USD_billion, Processed_Time 컬럼을 포함합니다.
-    4. Analysis: SQL 쿼리(Window Function 등)를 사용하여 100B USD 이상 국가와 Region별 Top 5 평균 GDP를 출력합니다.
+    4. Analysis: SQL 쿼리를 사용하여 100B USD 이상 국가와 Region별 Top 5 평균 GDP를 출력합니다.
+       Top 5 평균은 Region/GDP 순으로 정렬된 조회 결과를 순회하며 Python에서 집계합니다.
 
 추출된 GDP 데이터 개수, Region 매핑 상태, 필터링된 데이터 개수 등 각 단계의 진행 상황을 로그 파일에 기록합니다.
 """
 import datetime
+import io
+import itertools
 import json
+import logging
+import operator
 import os
+import re
 import sqlite3
 
-import bs4
 import pandas as pd
 import requests
 
@@ -27,6 +32,29 @@ LOG_FILE = 'data/etl_project_log.txt'
 DB_FILE = 'data/World_Economies.db'
 TABLE_NAME = 'Countries_by_GDP'
 
+# Country-Region 매핑 캐시 (_get_region_map 최초 호출 시 로드)
+_REGION_MAP = None
+
+# 정제용 정규 표현식 (호출마다 패턴을 다시 넘기지 않도록 모듈 로드 시 한 번만 컴파일)
+# GDP 값: '('/'['로 감싼 주석, 쉼표, 공백 / 국가명: [n 1] 등 각주 표기
+_GDP_CLEAN_RE = re.compile(r'[\(\[].*?[\)\]]|,|\s')
+_FOOTNOTE_RE = re.compile(r'\[.*?\]')
+
+# ETL 진행 로그 (data 디렉토리가 생성된 뒤 첫 기록 시점에 파일을 열도록 delay=True)
+_LOG_HANDLER = logging.FileHandler(LOG_FILE, encoding='utf-8', delay=True)
+_LOG_HANDLER.setFormatter(
+    logging.Formatter('%(asctime)s, %(message)s', datefmt='%Y-%B-%d-%H-%M-%S'))
+_LOGGER = logging.getLogger(__name__)
+_LOGGER.setLevel(logging.INFO)
+_LOGGER.addHandler(_LOG_HANDLER)
+
+# Wikipedia 요청용 HTTP 세션 (연결 재사용, gzip/deflate 압축 응답은 requests가 자동 협상)
+_SESSION = requests.Session()
+_SESSION.headers.update({
+    'User-Agent':
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
+})
+
 
 class SQLiteHandler:
     """SQLite 연결과 종료를 직접 관리하는 컨텍스트 매니저 클래스입니다.
@@ -65,22 +93,35 @@ def init_data_dir():
 def log_progress(message: str) -> None:
     """ETL 프로세스의 각 단계와 시간을 로그 파일에 기록합니다.
 
+    매 호출마다 파일을 열고 닫지 않고, 한 번 열린 logging 핸들러를 재사용합니다.
+
     Args:
         message: 기록할 로그 메시지.
     """
-    timestamp_format = '%Y-%B-%d-%H-%M-%S'
-    now = datetime.datetime.now()
-    timestamp = now.strftime(timestamp_format)
+    _LOGGER.info(message)
 
-    with open(LOG_FILE, 'a+', encoding='utf-8') as f:
-        f.write(f"{timestamp}, {message}\n")
+
+def _get_region_map() -> dict:
+    """Country-Region 매핑 JSON을 최초 호출 시 한 번만 읽고 이후에는 캐시를 반환합니다.
+
+    Returns:
+        국가명을 키로, Region을 값으로 하는 딕셔너리. 파일이 없으면 빈 딕셔너리.
+    """
+    global _REGION_MAP
+    if _REGION_MAP is None:
+        if os.path.exists(COUNTRY_REGION_JSON):
+            with open(COUNTRY_REGION_JSON, 'r', encoding='utf-8') as f:
+                _REGION_MAP = json.load(f)
+        else:
+            _REGION_MAP = {}
+    return _REGION_MAP
 
 
 def extract(url: str) -> pd.DataFrame:
     """웹 페이지에서 모든 국가의 GDP 원시 데이터를 추출합니다.
 
     이 단계에서는 필터링을 수행하지 않고 소스 테이블의 데이터를 최대한 보존합니다.
-    구조적 헤더(th) 및 static-row-header는 추출 대상에서 제외합니다.
+    구조적 헤더(th)는 컬럼명으로 처리되며, static-row-header(World) 행은 추출 대상에서 제외합니다.
 
     Args:
         url: 데이터를 추출할 위키피디아 페이지 URL.
@@ -90,47 +131,33 @@ def extract(url: str) -> pd.DataFrame:
     """
     log_progress("Extract phase Started")
 
-    headers = {
-        'User-Agent':
-        'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
-    }
-    response = requests.get(url, headers=headers)
+    response = _SESSION.get(url)
     response.raise_for_status()
-    soup = bs4.BeautifulSoup(response.text, 'html.parser')
 
-    df = pd.DataFrame(columns=["Country", "GDP_USD_million"])
+    # lxml 기반 pd.read_html로 대상 테이블을 행 단위 순회 없이 바로 데이터프레임으로 읽습니다.
+    # 원본 GDP 텍스트를 보존하기 위해 천 단위 구분자 변환(thousands)은 적용하지 않습니다.
+    # 캡션 전체로 대상 테이블을 한정하며, lxml(EXSLT) 정규식은 백슬래시 이스케이프를
+    # 처리하지 못하므로 '(', '$', ')'는 문자 클래스로 표기합니다.
+    try:
+        tables = pd.read_html(
+            io.BytesIO(response.content),
+            match=r'GDP forecast or estimate [(]million US[$][)] by country',
+            flavor='lxml',
+            thousands=None)
+    except ValueError as e:
+        log_progress("Extract phase Failed: Target table not found")
+        raise ValueError("Target table not found") from e
 
-    tables = soup.find_all('table', {'class': 'wikitable'})
-    target_table = next(
-        (t for t in tables
-         if 'GDP forecast or estimate (million US$) by country' in t.text),
-        None)
+    # 구조적 헤더(th) 행은 컬럼으로 흡수되므로 앞의 두 컬럼(국가, GDP)만 사용합니다.
+    df = tables[0].iloc[:, [0, 1]].copy()
+    df.columns = ["Country", "GDP_USD_million"]
+    df = df.dropna()
 
-    if not target_table:
-        log_progress("Extract phase Failed: Target table not found")
-        raise ValueError("Target table not found")
-
-    rows = target_table.find_all('tr')
-    for row in rows:
-        row_classes = row.get('class')
-        is_static_header = isinstance(
-            row_classes, list) and 'static-row-header' in row_classes
-        if row.find('th') or is_static_header:
-            continue
-
-        cols = row.find_all('td')
-        if len(cols) >= 3:
-            country_element = cols[0].find('a')
-            country = country_element.get_text(
-                strip=True) if country_element else cols[0].get_text(
-                    strip=True)
-            gdp_raw = cols[1].get_text(strip=True)
-
-            new_row = pd.DataFrame([{
-                "Country": country,
-                "GDP_USD_million": gdp_raw
-            }])
-            df = pd.concat([df, new_row], ignore_index=True)
+    # 국가명의 각주 표기([n 1] 등)를 제거하고 static-row-header(World) 행을 제외합니다.
+    df['Country'] = df['Country'].str.replace(_FOOTNOTE_RE, '',
+                                              regex=True).str.strip()
+    df['GDP_USD_million'] = df['GDP_USD_million'].astype(str)
+    df = df[df['Country'] != 'World'].copy()
 
     log_progress(f"Extract phase Ended: {len(df)} rows fetched")
     return df
@@ -151,26 +178,20 @@ def transform(df: pd.DataFrame) -> pd.DataFrame:
     df['Processed_Time'] = pd.to_datetime(
         datetime.datetime.now().replace(microsecond=0))
 
-    # 2. GDP 값 정제: 주석 제거 및 숫자형 변환
-    df['GDP_USD_million'] = df['GDP_USD_million'].str.replace(
-        r'[\(\[].*?[\)\]]', '', regex=True).str.strip()
+    # 2. GDP 값 정제: 주석, 쉼표, 공백을 한 번에 제거한 뒤 숫자형 변환
     df['GDP_USD_million'] = pd.to_numeric(df['GDP_USD_million'].str.replace(
-        ',', ''),
+        _GDP_CLEAN_RE, '', regex=True),
                                           errors='coerce')
 
     # 유효하지 않은 데이터 필터링
-    df = df.dropna(subset=['GDP_USD_million']).reset_index(drop=True)
+    # 인덱스는 사용하지 않으므로 재설정 없이 제자리(inplace) 필터링만 수행
+    df.dropna(subset=['GDP_USD_million'], inplace=True)
 
     # 3. 단위 변환 (Million -> Billion)
     df['GDP_USD_billion'] = (df['GDP_USD_million'] / 1000).round(2)
 
     # 4. Region 매핑
-    if os.path.exists(COUNTRY_REGION_JSON):
-        with open(COUNTRY_REGION_JSON, 'r', encoding='utf-8') as f:
-            region_map = json.load(f)
-        df['Region'] = df['Country'].map(region_map).fillna('Unknown')
-    else:
-        df['Region'] = 'Unknown'
+    df['Region'] = df['Country'].map(_get_region_map()).fillna('Unknown')
 
     log_progress("Transform phase Ended")
     return df[['Country', 'Region', 'GDP_USD_billion', 'Processed_Time']]
@@ -190,6 +211,10 @@ def load_to_db(df: pd.DataFrame, db_name: str, table_name: str) -> None:
     log_progress("Load to DB Started")
 
     with SQLiteHandler(db_name) as conn:
+        # WAL 저널링(DB 파일에 유지됨)과 완화된 동기화로 쓰기 비용을 줄입니다.
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+
         cursor = conn.cursor()
         # id를 PK로 설정하고 Processed_Time을 TIMESTAMP 타입으로 생성
         cursor.execute(f"""
@@ -201,10 +226,26 @@ def load_to_db(df: pd.DataFrame, db_name: str, table_name: str) -> None:
                 Processed_Time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         """)
+        # 분석 쿼리의 MAX(Processed_Time), WHERE Processed_Time = ? 조건을 인덱스로 처리
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_{table_name}_Processed_Time
+            ON {table_name} (Processed_Time)
+        """)
         cursor.close()
 
         # 데이터 적재 (Append 모드로 이력 누적)
-        df.to_sql(table_name, conn, if_exists='append', index=False)
+        # 고정 스키마이므로 to_sql 대신 executemany로 단일 트랜잭션에서 일괄 INSERT 합니다.
+        columns = ['Country', 'Region', 'GDP_USD_billion', 'Processed_Time']
+        insert_sql = f"""
+            INSERT INTO {table_name} ({', '.join(columns)})
+            VALUES ({', '.join('?' * len(columns))})
+        """
+        # Processed_Time은 기존 to_sql 적재분과 동일한 'YYYY-MM-DD HH:MM:SS' 문자열로 저장
+        processed_time = df['Processed_Time'].dt.strftime('%Y-%m-%d %H:%M:%S')
+        rows = df[columns].assign(Processed_Time=processed_time)
+        with conn:
+            conn.executemany(insert_sql, rows.itertuples(index=False,
+                                                         name=None))
 
     log_progress(f"Load to DB Ended: {db_name}")
 
@@ -213,7 +254,8 @@ def run_sql_analysis(db_name: str, table_name: str) -> None:
     """SQL 쿼리를 사용하여 최신 데이터를 분석하고 결과를 화면에 출력합니다.
 
     요구사항에 따라 100B USD 이상 국가 목록과 
-    Region별 Top 5 평균 GDP를 SQL Window Function 등을 활용해 구합니다.
+    Region별 Top 5 평균 GDP를 구합니다. Top 5 평균은 전체 행에 순위를 매기는
+    Window Function 대신, 정렬된 커서를 Region별로 순회하며 앞의 5개만 집계합니다.
 
     Args:
         db_name: 분석할 데이터베이스 이름.
@@ -247,29 +289,27 @@ def run_sql_analysis(db_name: str, table_name: str) -> None:
         print("-" * 70)
         print(f"총 {len(high_gdp_df)}개 국가가 100B USD 이상입니다.")
 
-        # 3. Region별 Top 5 평균 GDP 분석 (SQL - Window Function)
+        # 3. Region별 Top 5 평균 GDP 분석 (SQL 정렬 + Region별 상위 5개 집계)
         query_top5_avg = f"""
-            WITH RankedGDP AS (
-                SELECT Region, GDP_USD_billion, 
-                       ROW_NUMBER() OVER (PARTITION BY Region ORDER BY GDP_USD_billion DESC) as rank
-                FROM {table_name} 
-                WHERE Processed_Time = ?
-            )
-            SELECT Region, ROUND(AVG(GDP_USD_billion), 2) as Average_GDP
-            FROM RankedGDP 
-            WHERE rank <= 5 
-            GROUP BY Region 
-            ORDER BY Average_GDP DESC
+            SELECT Region, GDP_USD_billion
+            FROM {table_name} 
+            WHERE Processed_Time = ?
+            ORDER BY Region, GDP_USD_billion DESC
         """
-        region_avg_df = pd.read_sql(query_top5_avg,
-                                    conn,
-                                    params=(latest_time, ))
+        cursor = conn.execute(query_top5_avg, (latest_time, ))
+        region_avg = []
+        for region, region_rows in itertools.groupby(
+                cursor, key=operator.itemgetter(0)):
+            top5 = [gdp for _, gdp in itertools.islice(region_rows, 5)]
+            region_avg.append((region, round(sum(top5) / len(top5), 2)))
+        cursor.close()
+        region_avg.sort(key=operator.itemgetter(1), reverse=True)
 
         print("\n" + "=" * 70)
         print(f"{'Region':<45} {'Top 5 Average GDP':>20}")
         print("-" * 70)
-        for _, row in region_avg_df.iterrows():
-            print(f"{row['Region']:<45} {row['Average_GDP']:>20,.2f}")
+        for region, average_gdp in region_avg:
+            print(f"{region:<45} {average_gdp:>20,.2f}")
         print("=" * 70)
 
     log_progress("Analysis phase Ended")